@@ -0,0 +1,328 @@
+import bisect
+import time
+from array import array
+
+from device_table import ip_to_str, ipv6_to_str, mac_to_int, mac_to_str
+
+# Backing model for the device Treeview in window.py.
+# It is a view over the shared DeviceTable and holds nothing per row but MAC
+# ints: one array in the current sort order and one with the rows that pass
+# the filters. Sort keys are read straight from the table's columns and the
+# display strings are only built for rows handed to Tk, so a new device lands
+# in its sorted spot with a bisect and re-sorting or filtering is one pass
+# plus one set_children call.
+
+COLUMNS = ("Type", "MAC Address", "Vendor", "IP Address", "IPv6 Address", "Status")
+STATUS_TEXT = ("Active", "Inactive", "Stale")
+ACTIVE, INACTIVE, STALE = range(3)
+
+# above this many rows changing at once, re-sorting is cheaper than moving each one
+BATCH_REBUILD = 64
+
+NO_IPV4_KEY = 1 << 32    # rows without an address sort last
+NO_IPV6_KEY = 1 << 128
+
+
+class DeviceModel:
+    """Sorted, filtered view over a DeviceTable, kept as arrays of MAC ints.
+
+    Status is derived from last-seen times: rows not seen since `started`
+    (i.e. only known from the snapshot) are Stale, rows not seen since
+    `cutoff` are Inactive.
+    """
+
+    def __init__(self, table, type_of=lambda vendor: "", started=None):
+        self.table = table
+        self.type_of = type_of
+        self.started = time.time() if started is None else started
+        self.cutoff = 0.0
+        self.sort_col = None
+        self.reverse = False
+        self.text = ""
+        self.vendor = None
+        self._vendor_filter = None   # vendor id for self.vendor, -1 if no row has it
+        self._col_key = None         # table index -> sort key; None sorts by MAC
+        self._index = None           # every MAC in sort order; None means the table's own (MAC) order
+        self._view = array("Q")      # MACs passing the filters, in sort order
+        self._pending = {}           # MAC -> sort key it is filed under while being moved
+        self._vendor_text = {}       # vendor id -> (vendor, type) lowercased
+        self._hits = {}              # vendor id -> whether its vendor/type text matches the search
+
+    def __len__(self):
+        return len(self.table)
+
+    # ---- per-row values -------------------------------------------------
+
+    def _status(self, i):
+        ts = self.table.seen[i]
+        if ts < self.started:
+            return STALE
+        return INACTIVE if ts < self.cutoff else ACTIVE
+
+    def status(self, mac):
+        return STATUS_TEXT[self._status(self.table._find(mac))]
+
+    def values(self, mac):
+        """Display values for one row, in COLUMNS order."""
+        i = self.table._find(mac)
+        dev = self.table._record(i)
+        return (self.type_of(dev.vendor), dev.mac_str, dev.vendor, dev.ip_str, dev.ipv6_str,
+                STATUS_TEXT[self._status(i)])
+
+    def counts(self):
+        """(active, inactive, stale) row counts."""
+        started, cutoff = self.started, self.cutoff
+        inactive = stale = 0
+        for ts in self.table.seen:
+            if ts < started:
+                stale += 1
+            elif ts < cutoff:
+                inactive += 1
+        return len(self.table) - inactive - stale, inactive, stale
+
+    def vendors(self):
+        t = self.table
+        return sorted({t.vendors[v] for v in set(t.vendor_ids)}, key=str.lower)
+
+    # ---- keys / filters -------------------------------------------------
+
+    def _texts(self, vid):
+        texts = self._vendor_text.get(vid)
+        if texts is None:
+            vendor = self.table.vendors[vid]
+            texts = self._vendor_text[vid] = (vendor.lower(), self.type_of(vendor).lower())
+        return texts
+
+    def _column_key(self, col):
+        t = self.table
+        if col == "Type":
+            return lambda i: self._texts(t.vendor_ids[i])[1]
+        if col == "Vendor":
+            return lambda i: self._texts(t.vendor_ids[i])[0]
+        if col == "IP Address":
+            return lambda i: t.ips[i] or NO_IPV4_KEY
+        if col == "IPv6 Address":
+            return lambda i: min(t.ipv6.get(t.macs[i], ()), default=NO_IPV6_KEY)
+        if col == "Status":
+            return self._status
+        return None  # MAC Address, or no column yet
+
+    def _key(self, mac):
+        f = self._col_key
+        return mac if f is None else (f(self.table._find(mac)), mac)
+
+    def _bisect_key(self, mac):
+        key = self._pending.get(mac)
+        return self._key(mac) if key is None else key
+
+    def _matches(self, i):
+        t = self.table
+        vid = t.vendor_ids[i]
+        if self._vendor_filter is not None and vid != self._vendor_filter:
+            # -1: the vendor had no id yet when the filter was set; take it from its first row
+            if self._vendor_filter != -1 or t.vendors[vid] != self.vendor:
+                return False
+            self._vendor_filter = vid
+        text = self.text
+        if not text:
+            return True
+        hit = self._hits.get(vid)
+        if hit is None:
+            hit = self._hits[vid] = any(text in s for s in self._texts(vid))
+        if hit:
+            return True
+        # the rest of the row is only turned into text while a search is typed
+        mac = t.macs[i]
+        if text in mac_to_str(mac) or text in STATUS_TEXT[self._status(i)].lower():
+            return True
+        if t.ips[i] and text in ip_to_str(t.ips[i]):
+            return True
+        return any(text in ipv6_to_str(a) for a in t.ipv6.get(mac, ()))
+
+    def _display_pos(self, i):
+        return len(self._view) - 1 - i if self.reverse else i
+
+    def _find_in(self, arr, mac, key):
+        i = bisect.bisect_left(arr, key, key=self._bisect_key)
+        return i if i < len(arr) and arr[i] == mac else None
+
+    # ---- updates --------------------------------------------------------
+
+    def _refile(self, mac, old_key):
+        """Put a row where its current data sorts. Returns (old, new) display positions, None where hidden."""
+        view, index = self._view, self._index
+        old = new = None
+        if old_key is not None:
+            self._pending[mac] = old_key
+            i = self._find_in(view, mac, old_key)
+            if i is not None:
+                old = self._display_pos(i)
+                del view[i]
+            if index is not None:
+                j = self._find_in(index, mac, old_key)
+                if j is not None:
+                    del index[j]
+            del self._pending[mac]
+        key = self._key(mac)
+        if index is not None:
+            index.insert(bisect.bisect_left(index, key, key=self._bisect_key), mac)
+        if self._matches(self.table._find(mac)):
+            i = bisect.bisect_left(view, key, key=self._bisect_key)
+            view.insert(i, mac)
+            new = self._display_pos(i)
+        return old, new
+
+    def update(self, mac, vendor, ip, ts=None):
+        """Merge a sighting into the table; returns (device, redraw, old, new).
+
+        `redraw` is False when nothing shown for the row changed; old/new are
+        its display positions before and after, None where hidden.
+        """
+        if isinstance(mac, str):
+            mac = mac_to_int(mac)
+        i = self.table._find(mac)
+        old_key = self._key(mac) if i >= 0 else None
+        old_status = self._status(i) if i >= 0 else None
+        dev, changed = self.table.update(mac, vendor, ip, ts)
+        if not changed and self._status(self.table._find(mac)) == old_status:
+            return dev, False, None, None
+        old, new = self._refile(mac, old_key)
+        return dev, True, old, new
+
+    def set_cutoff(self, cutoff):
+        """Move the Active/Inactive boundary; returns (flipped MACs, moves).
+
+        moves is [(mac, old, new)] to apply in order, or None when the view
+        was rebuilt and the whole order should be handed to Tk again.
+        """
+        t = self.table
+        lo, hi = sorted((self.cutoff, cutoff))
+        lo = max(lo, self.started)
+        flipped = [mac for mac, ts in zip(t.macs, t.seen) if lo <= ts < hi]
+        if not flipped or (self.sort_col != "Status" and not self.text):
+            self.cutoff = cutoff
+            return flipped, []
+        if len(flipped) > BATCH_REBUILD:
+            self.cutoff = cutoff
+            self.rebuild()
+            return flipped, None
+        # file every flipped row under its old key until it has been moved
+        self._pending = {mac: self._key(mac) for mac in flipped}
+        self.cutoff = cutoff
+        moves = [(mac, *self._refile(mac, self._pending[mac])) for mac in flipped]
+        self._pending = {}
+        return flipped, moves
+
+    def expire(self, before):
+        """Drop devices last seen before `before` from the table and the view; returns their MACs."""
+        removed = self.table.expire(before)
+        if removed:
+            gone = set(removed)
+            if self._index is not None:
+                self._index = array("Q", (m for m in self._index if m not in gone))
+            self._view = array("Q", (m for m in self._view if m not in gone))
+        return removed
+
+    def expire_ipv6(self, before):
+        """Drop old IPv6 addresses; returns (changed MACs, moves) like set_cutoff."""
+        changed = self.table.expire_ipv6(before)
+        if not changed or (self.sort_col != "IPv6 Address" and not self.text):
+            return changed, []
+        self.rebuild()
+        return changed, None
+
+    # ---- view -----------------------------------------------------------
+
+    def visible(self):
+        """MACs of the rows that pass the filters, in display order."""
+        macs = self._view.tolist()
+        if self.reverse:
+            macs.reverse()
+        return macs
+
+    def rebuild(self):
+        """Re-sort and re-filter everything, e.g. after the table was loaded from a snapshot."""
+        self._vendor_text.clear()
+        self._hits.clear()
+        self._resolve_vendor()
+        self._resort()
+        self._rebuild_view()
+
+    def sort(self, col, reverse=False):
+        if col != self.sort_col:
+            self.sort_col = col
+            self._col_key = self._column_key(col)
+            self._resort()
+            self._rebuild_view()
+        self.reverse = reverse
+        return self.visible()
+
+    def set_filter(self, text=None, vendor=None):
+        """Apply search text / vendor filters. Narrowing the search only re-checks visible rows."""
+        text = (text or "").strip().lower()
+        # an unresolved vendor (-1) may have gained rows the current view never saw
+        narrowing = vendor == self.vendor and self.text in text and self._vendor_filter != -1
+        if text != self.text:
+            self._hits.clear()
+        self.text, self.vendor = text, vendor
+        self._resolve_vendor()
+        self._rebuild_view(self._view if narrowing else None)
+        return self.visible()
+
+    def _resolve_vendor(self):
+        self._vendor_filter = None if self.vendor is None else self.table._vendor_id.get(self.vendor, -1)
+
+    def _resort(self):
+        if self._col_key is None:
+            self._index = None
+            return
+        t, f = self.table, self._col_key
+        order = sorted(range(len(t)), key=lambda i: (f(i), t.macs[i]))
+        self._index = array("Q", (t.macs[i] for i in order))
+
+    def _rebuild_view(self, candidates=None):
+        t = self.table
+        order = t.macs if self._index is None else self._index
+        if not self.text and self._vendor_filter is None:
+            self._view = array("Q", order)
+        elif candidates is not None:
+            find = t._find
+            self._view = array("Q", (m for m in candidates if self._matches(find(m))))
+        elif order is t.macs:
+            self._view = array("Q", (m for i, m in enumerate(order) if self._matches(i)))
+        else:
+            keep = {m for i, m in enumerate(t.macs) if self._matches(i)}
+            self._view = array("Q", (m for m in order if m in keep))
+
+if __name__ == "__main__":
+    # Rough timing for a large table: python device_model.py [rows]
+    import random
+    import sys
+
+    from device_table import DeviceTable
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    vendors = ["Apple, Inc.", "Samsung Electronics", "Intel Corporate", "Raspberry Pi Foundation", "unknown"]
+    model = DeviceModel(DeviceTable(), type_of=lambda v: "🍎 Apple" if "apple" in v.lower() else "🔧 Device")
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        fn()
+        print(f"{label:<28}{(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    now = time.time()
+    rows = [(mac_to_str(random.getrandbits(48)), random.choice(vendors), f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+            for i in range(n)]
+
+    model.sort("IP Address")
+    timed(f"insert {n} sorted", lambda: [model.update(mac, v, ip, now) for mac, v, ip in rows])
+    timed("sort by MAC", lambda: model.sort("MAC Address"))
+    timed("sort by IP, descending", lambda: model.sort("IP Address", reverse=True))
+    timed("filter text 'a'", lambda: model.set_filter("a"))
+    timed("narrow to 'ab'", lambda: model.set_filter("ab"))
+    timed("vendor filter", lambda: model.set_filter("", "Apple, Inc."))
+    timed("clear filters", lambda: model.set_filter())
+    mac, v, _ = rows[0]
+    timed("single update", lambda: model.update(mac, v, "10.255.255.254", now + 1))
+    model.sort("Status")
+    timed("status flips (sorted by it)", lambda: model.set_cutoff(now + 0.5))
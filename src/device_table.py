@@ -0,0 +1,383 @@
+import bisect
+import operator
+import os
+import socket
+import struct
+import sys
+import time
+from array import array
+
+# Shared device state for the scanner and both GUIs.
+# Devices are keyed by the MAC as a 48-bit int, IPv4 addresses are ints and
+# vendor names are interned once, so thousands of devices share a handful of
+# vendor strings. Text forms are only built when something is displayed.
+
+NO_IP = 0
+
+# Inventory snapshot written at shutdown (and periodically) so the next launch
+# can show the last known devices straight away.
+SNAPSHOT_PATH = os.environ.get(
+    "HOMENETSAFE_SNAPSHOT", os.path.join(os.path.expanduser("~"), ".homenetsafe", "inventory.bin")
+)
+_SNAPSHOT_MAGIC = b"HNS\x02"
+_SNAPSHOT_HEADER = struct.Struct("<4sII")  # magic, devices, vendor blob length
+# devices not seen for this long are left out when a snapshot is loaded
+SNAPSHOT_MAX_AGE = 7 * 24 * 60 * 60
+
+# IPv6 privacy addresses rotate (daily on most systems), so an address that
+# hasn't been seen for this long is dropped instead of piling up on its device.
+IPV6_MAX_AGE = 60 * 60
+
+
+def mac_to_int(mac):
+    return int(mac.replace(":", "").replace("-", ""), 16)
+
+
+def mac_to_str(mac):
+    return mac.to_bytes(6, "big").hex(":")
+
+
+def ip_to_int(ip):
+    """Dotted IPv4 -> int, 0 for anything that isn't one (e.g. the "—" placeholder)."""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big") if ip.count(".") == 3 else NO_IP
+    except OSError:
+        return NO_IP
+
+
+def ip_to_str(ip):
+    return socket.inet_ntoa(ip.to_bytes(4, "big")) if ip else "—"
+
+
+def ipv6_to_int(ip):
+    return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+
+
+def ipv6_to_str(ip):
+    return socket.inet_ntop(socket.AF_INET6, ip.to_bytes(16, "big"))
+
+
+class Device:
+    """One device, as handed to callers. The table itself stores columns, not these."""
+    __slots__ = ("mac", "ip", "ipv6", "vendor", "last_seen")
+
+    def __init__(self, mac, vendor="unknown", ip=NO_IP, ipv6=(), last_seen=0.0):
+        self.mac = mac          # 48-bit int
+        self.ip = ip            # IPv4 as int, NO_IP if unknown
+        self.ipv6 = ipv6        # sorted tuple of IPv6 ints
+        self.vendor = vendor
+        self.last_seen = last_seen
+
+    @property
+    def mac_str(self):
+        return mac_to_str(self.mac)
+
+    @property
+    def ip_str(self):
+        return ip_to_str(self.ip)
+
+    @property
+    def ipv6_str(self):
+        return ", ".join(ipv6_to_str(a) for a in self.ipv6) or "—"
+
+    def addresses(self):
+        """Every address as text, IPv4 first."""
+        out = [ip_to_str(self.ip)] if self.ip else []
+        return out + [ipv6_to_str(a) for a in self.ipv6]
+
+
+class DeviceTable:
+    """Devices stored as parallel arrays sorted by MAC; scanner sightings merge here by MAC.
+
+    A row costs 24 bytes (MAC, IPv4, last seen, vendor id) instead of a
+    handful of str/tuple/dict entries. IPv6 addresses are rare enough to
+    live in a side dict, each with its own last-seen time.
+    """
+
+    def __init__(self):
+        self.macs = array("Q")       # sorted, so lookups are a bisect
+        self.ips = array("I")
+        self.seen = array("d")
+        self.vendor_ids = array("I")
+        self.vendors = []            # interned vendor names, indexed by vendor id
+        self._vendor_id = {}
+        self.ipv6 = {}               # mac -> {IPv6 int: last seen}
+
+    def __len__(self):
+        return len(self.macs)
+
+    def __iter__(self):
+        for i in range(len(self.macs)):
+            yield self._record(i)
+
+    def __contains__(self, mac):
+        return self._find(mac) >= 0
+
+    def _find(self, mac):
+        i = bisect.bisect_left(self.macs, mac)
+        return i if i < len(self.macs) and self.macs[i] == mac else -1
+
+    def _record(self, i):
+        mac = self.macs[i]
+        addrs = self.ipv6.get(mac)
+        return Device(mac, self.vendors[self.vendor_ids[i]], self.ips[i],
+                      tuple(sorted(addrs)) if addrs else (), self.seen[i])
+
+    def _vendor(self, vendor):
+        vid = self._vendor_id.get(vendor)
+        if vid is None:
+            vid = self._vendor_id[vendor] = len(self.vendors)
+            self.vendors.append(sys.intern(vendor))
+        return vid
+
+    def get(self, mac):
+        i = self._find(mac)
+        return self._record(i) if i >= 0 else None
+
+    def update(self, mac, vendor, ip, ts=None):
+        """Merge one (mac, vendor, ip) sighting; returns (device, changed).
+
+        `mac` may be text or an int; `ip` may be IPv4 or IPv6 text. IPv4
+        replaces the previous one (DHCP moves devices), IPv6 accumulates
+        until an address goes unseen for IPV6_MAX_AGE.
+        """
+        if isinstance(mac, str):
+            mac = mac_to_int(mac)
+        ts = time.time() if ts is None else ts
+        i = bisect.bisect_left(self.macs, mac)
+        changed = i == len(self.macs) or self.macs[i] != mac
+        if changed:
+            self.macs.insert(i, mac)
+            self.ips.insert(i, NO_IP)
+            self.seen.insert(i, ts)
+            self.vendor_ids.insert(i, self._vendor(vendor or "unknown"))
+        elif vendor and vendor != self.vendors[self.vendor_ids[i]]:
+            self.vendor_ids[i] = self._vendor(vendor)
+            changed = True
+
+        if ip and ":" in ip:
+            a = ipv6_to_int(ip)
+            addrs = self.ipv6.get(mac)
+            if addrs is None:
+                addrs = self.ipv6[mac] = {}
+            if a not in addrs:
+                changed = True
+            addrs[a] = max(ts, addrs.get(a, ts))
+        elif ip:
+            a = ip_to_int(ip)
+            if a and a != self.ips[i]:
+                self.ips[i] = a
+                changed = True
+        if mac in self.ipv6 and self._expire_ipv6(mac, ts - IPV6_MAX_AGE):
+            changed = True
+        self.seen[i] = ts
+        return self._record(i), changed
+
+    def _expire_ipv6(self, mac, before):
+        addrs = self.ipv6[mac]
+        old = [a for a, ts in addrs.items() if ts < before]
+        for a in old:
+            del addrs[a]
+        if not addrs:
+            del self.ipv6[mac]
+        return bool(old)
+
+    def expire_ipv6(self, before):
+        """Drop IPv6 addresses last seen before `before`; returns the MACs that lost one."""
+        return [mac for mac in list(self.ipv6) if self._expire_ipv6(mac, before)]
+
+    def expire(self, before):
+        """Drop devices last seen before `before`; returns their MACs."""
+        if not self.seen or min(self.seen) >= before:
+            return []
+        keep = [i for i, ts in enumerate(self.seen) if ts >= before]
+        removed = [mac for mac, ts in zip(self.macs, self.seen) if ts < before]
+        self.macs, self.ips, self.seen, self.vendor_ids = (
+            array(col.typecode, [col[i] for i in keep]) for col in self._columns()
+        )
+        for mac in removed:
+            self.ipv6.pop(mac, None)
+        return removed
+
+    def active(self, ttl, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for ts in self.seen if now - ts <= ttl)
+
+    def clear(self):
+        for col in (self.macs, self.ips, self.seen, self.vendor_ids):
+            del col[:]
+        self.ipv6.clear()
+
+    # ---- snapshot -------------------------------------------------------
+
+    def _columns(self):
+        return (self.macs, self.ips, self.seen, self.vendor_ids)
+
+    def save(self, path=SNAPSHOT_PATH):
+        """Write the table as one compact binary file (replaced atomically)."""
+        vendors = "\n".join(self.vendors).encode("utf-8")
+        parts = [_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(self.macs), len(vendors)), vendors]
+        for col in self._columns():
+            col = array(col.typecode, col)
+            if sys.byteorder != "little":
+                col.byteswap()
+            parts.append(col.tobytes())
+        parts.append(struct.pack("<I", len(self.ipv6)))
+        for mac, addrs in self.ipv6.items():
+            parts.append(struct.pack("<QH", mac, len(addrs)))
+            for a, ts in addrs.items():
+                parts.append(a.to_bytes(16, "big") + struct.pack("<d", ts))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp, path)
+
+    def load(self, path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE):
+        """Replace the contents with a saved snapshot; False (table untouched) if missing or unreadable.
+
+        Devices last seen more than `max_age` seconds ago are dropped.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, n, vendor_len = _SNAPSHOT_HEADER.unpack_from(data, 0)
+            if magic != _SNAPSHOT_MAGIC:
+                return False
+            off = _SNAPSHOT_HEADER.size
+            if off + vendor_len > len(data):  # truncated file
+                return False
+            vendors = data[off:off + vendor_len].decode("utf-8").split("\n") if vendor_len else []
+            off += vendor_len
+            cols = []
+            for typecode in ("Q", "I", "d", "I"):
+                col = array(typecode)
+                size = col.itemsize * n
+                col.frombytes(data[off:off + size])
+                if len(col) != n:  # truncated file
+                    return False
+                if sys.byteorder != "little":
+                    col.byteswap()
+                cols.append(col)
+                off += size
+            ipv6 = {}
+            (count,) = struct.unpack_from("<I", data, off)
+            off += 4
+            for _ in range(count):
+                mac, k = struct.unpack_from("<QH", data, off)
+                off += 10
+                if off + 24 * k > len(data):  # truncated inside the address list
+                    return False
+                addrs = ipv6[mac] = {}
+                for _ in range(k):
+                    addrs[int.from_bytes(data[off:off + 16], "big")] = struct.unpack_from("<d", data, off + 16)[0]
+                    off += 24
+            # damaged rather than cut short: trailing bytes, unsorted MACs, unknown vendors
+            if off != len(data):
+                return False
+            macs, vendor_ids = cols[0], cols[3]
+            if not all(map(operator.lt, macs, macs[1:])):  # must be strictly increasing
+                return False
+            if n and max(vendor_ids) >= len(vendors):
+                return False
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            return False
+
+        self.macs, self.ips, self.seen, self.vendor_ids = cols
+        self.vendors = [sys.intern(v) for v in vendors]
+        self._vendor_id = {v: i for i, v in enumerate(self.vendors)}
+        self.ipv6 = ipv6
+        if max_age is not None:
+            self.expire(time.time() - max_age)
+        return True
+
+
+if __name__ == "__main__":
+    # Per-GUI device state vs. what each GUI kept before: python device_table.py [devices]
+    # (Tk's own copy of the row text and the window2.py label widgets exist in
+    # both versions and aren't counted.)
+    import random
+    import tracemalloc
+
+    from device_model import DeviceModel
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    vendors = ["Apple, Inc.", "Samsung Electronics", "Intel Corporate", "Raspberry Pi Foundation", "unknown"]
+    # raw (mac, vendor, ip) sightings; each builder makes its own strings, the way
+    # scapy/manuf hand a fresh str per callback
+    raw = [(random.getrandbits(48), random.randrange(len(vendors)), 0x0A000000 + i) for i in range(n)]
+    widget = object()  # stands in for a CTkLabel
+
+    def sighting(mac, v, ip):
+        return mac_to_str(mac), "".join(vendors[v]), ip_to_str(ip)
+
+    def measure(label, build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:<52}{size / n:8.0f} B/device")
+        return result
+
+    def old_window():
+        known_devices, last_seen = {}, {}
+        for i, r in enumerate(raw):
+            mac, vendor, ip = sighting(*r)
+            known_devices[mac] = f"I{i:03X}"
+            last_seen[mac] = time.time()
+        return known_devices, last_seen
+
+    def new_window():
+        model = DeviceModel(DeviceTable())
+        model.sort("IP Address")
+        for r in raw:
+            model.update(*sighting(*r))
+        return model
+
+    def old_window2():
+        table_rows, seen = [], set()
+        for r in raw:
+            mac, vendor, ip = sighting(*r)
+            table_rows.append((mac, vendor, ip))
+            seen.add(mac)
+        return table_rows, seen
+
+    def new_window2():
+        table, row_labels = DeviceTable(), {}
+        for r in raw:
+            dev = table.update(*sighting(*r))[0]
+            row_labels[dev.mac] = (widget, widget, widget)
+        return table, row_labels
+
+    measure("window.py  old: known_devices + last_seen", old_window)
+    measure("window.py  new: DeviceTable + DeviceModel", new_window)
+    old = measure("window2.py old: table_rows + seen", old_window2)[0]
+    table = measure("window2.py new: DeviceTable + row_labels", new_window2)[0]
+
+    def scanner():
+        table = DeviceTable()
+        for r in raw:
+            table.update(*sighting(*r))
+        return table
+
+    measure("network_scan.py:    DeviceTable", scanner)
+
+    start = time.perf_counter()
+    sorted(old, key=lambda r: tuple(int(p) for p in r[2].split(".")))
+    old_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    sorted(range(len(table)), key=table.ips.__getitem__)
+    new_ms = (time.perf_counter() - start) * 1000
+    print(f"sort by IP: old {old_ms:.1f} ms, new {new_ms:.1f} ms")
+
+    # warm start: how long until the last inventory is back in memory
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "inventory.bin")
+    start = time.perf_counter()
+    table.save(path)
+    save_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    DeviceTable().load(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"snapshot: {os.path.getsize(path) / n:.0f} B/device, save {save_ms:.1f} ms, load {load_ms:.1f} ms")
@@ -1,36 +1,263 @@
 import get_local_ip_address as host_ip
+import pi_mode
+from device_table import DeviceTable, mac_to_int
 import scapy.all as scapy
-from ipaddress import IPv4Interface
-import socket, time
+from ipaddress import IPv4Interface, IPv6Address
+import functools, os, socket, time, threading
 
 # Vendor lookup (optional: pip install manuf)
+# The full manuf table costs tens of MB, so pi mode never loads it and looks
+# single OUIs up in the data file instead, keeping a small cache of results
+# that the pi-mode memory budget may drop.
+_parser = None
+_manuf_path = None
 try:
     from manuf import manuf
-    _parser = manuf.MacParser()
-    def _vendor(mac):
-        return _parser.get_manuf(mac) or _parser.get_manuf_long(mac) or "unknown"
+    _manuf_path = getattr(manuf.MacParser, "get_packaged_manuf_file_path", None)
+    _manuf_path = _manuf_path() if _manuf_path else os.path.join(os.path.dirname(manuf.__file__), "manuf")
+    if not pi_mode.ENABLED:
+        _parser = manuf.MacParser()
 except Exception:
-    def _vendor(mac):
+    pass
+
+
+@functools.lru_cache(maxsize=256)
+def _vendor_from_file(oui):
+    try:
+        with open(_manuf_path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(oui) and line[len(oui):len(oui) + 1] == "\t":
+                    return line.rstrip("\n").split("\t")[1] or "unknown"
+    except (OSError, TypeError):
+        pass
+    return "unknown"
+
+
+def _vendor(mac):
+    parser = _parser
+    if parser is not None:
+        return parser.get_manuf(mac) or parser.get_manuf_long(mac) or "unknown"
+    if _manuf_path is None:
         return "unknown"
+    return _vendor_from_file(mac.upper().replace("-", ":")[:8])
+
+
+def _drop_vendor_cache():
+    # safe from any thread: _vendor reads _parser once and lru_cache locks itself
+    global _parser
+    _parser = None
+    _vendor_from_file.cache_clear()
+
+
+# IPv6 discovery settings. An IPv6 prefix is far too big to sweep, so we only
+# ping ff02::1 once per cycle, solicit a few likely addresses, and listen.
+NS_PER_SECOND = 20       # pacing for neighbor solicitations so we never flood the link
+NS_MAX_PER_CYCLE = 128
+LINK_LOCAL_PREFIX = 0xfe80 << 48
+# how long each passive sniff runs before checking stop_event again
+NDP_SNIFF_TIMEOUT = 30 if pi_mode.ENABLED else 2
+
+
+def _eui64(mac, prefix):
+    """Address a SLAAC host with this MAC (48-bit int) would pick in the given /64 (prefix = top 64 bits)."""
+    b = bytearray(mac.to_bytes(6, "big"))
+    b[0] ^= 0x02
+    iid = bytes(b[:3]) + b"\xff\xfe" + bytes(b[3:])
+    return str(IPv6Address((prefix << 64) | int.from_bytes(iid, "big")))
+
+
+def _ipv6_prefixes():
+    prefixes = {LINK_LOCAL_PREFIX}
+    try:
+        for addr, scope, _ in scapy.in6_getifaddr():
+            if scope == scapy.IPV6_ADDR_GLOBAL:
+                prefixes.add(int(IPv6Address(addr)) >> 64)
+    except Exception:
+        pass
+    return prefixes
+
+
+def _ns_round(macs, cursor, prefixes):
+    """The MACs to solicit this cycle and the cursor for the next one.
+
+    Each cycle takes the next NS_MAX_PER_CYCLE // len(prefixes) MACs after
+    `cursor`, wrapping round, so every device gets its turn on a big LAN.
+    """
+    if not macs:
+        return [], 0
+    per_cycle = max(1, NS_MAX_PER_CYCLE // max(1, len(prefixes)))
+    cursor %= len(macs)
+    chosen = (macs[cursor:] + macs[:cursor])[:per_cycle]
+    return chosen, (cursor + len(chosen)) % len(macs)
+
+
+def _ipv6_sweep(known_macs, prefixes, report, stop_event):
+    """One round of active IPv6 discovery: multicast echo, then paced NS for EUI-64 guesses."""
+    echo = scapy.Ether(dst="33:33:00:00:00:01") / scapy.IPv6(dst="ff02::1") / scapy.ICMPv6EchoRequest()
+    ans, _ = scapy.srp(echo, multi=True, timeout=2, verbose=False)
+    for _, rcv in ans:
+        report(rcv[scapy.Ether].src, rcv[scapy.IPv6].src)
+
+    targets = [_eui64(mac, prefix) for mac in known_macs for prefix in prefixes]
+    targets = targets[:NS_MAX_PER_CYCLE]
+    for i in range(0, len(targets), NS_PER_SECOND):
+        if stop_event is not None and stop_event.is_set():
+            return
+        batch = []
+        for tgt in targets[i:i + NS_PER_SECOND]:
+            nsma = scapy.in6_getnsma(socket.inet_pton(socket.AF_INET6, tgt))
+            batch.append(
+                scapy.Ether(dst=scapy.in6_getnsmac(nsma))
+                / scapy.IPv6(dst=socket.inet_ntop(socket.AF_INET6, nsma))
+                / scapy.ICMPv6ND_NS(tgt=tgt)
+            )
+        ans, _ = scapy.srp(batch, timeout=1, inter=1.0 / NS_PER_SECOND, verbose=False)
+        for _, rcv in ans:
+            mac = rcv[scapy.Ether].src
+            if scapy.ICMPv6NDOptDstLLAddr in rcv:
+                mac = rcv[scapy.ICMPv6NDOptDstLLAddr].lladdr
+            report(mac, rcv[scapy.ICMPv6ND_NA].tgt)
+
 
-def run_scan(callback=None, stop_event=None, interval=30):
-    """Continuously scan until stop_event is set."""
+# Only on-link NDP: RS/RA/NS/NA (types 133-136) are always sent with hop limit
+# 255, so anything a router forwarded (echo replies from remote hosts etc.)
+# fails the check and can't attach a remote address to the router's MAC.
+NDP_FILTER = "icmp6 and ip6[7] == 255 and ip6[40] >= 133 and ip6[40] <= 136"
+NDP_TYPES = (scapy.ICMPv6ND_RS, scapy.ICMPv6ND_RA, scapy.ICMPv6ND_NS, scapy.ICMPv6ND_NA)
+
+
+def _ndp_neighbor(pkt):
+    """(mac, ipv6) announced by one NDP message, or None."""
+    if scapy.IPv6 not in pkt or scapy.Ether not in pkt or pkt[scapy.IPv6].hlim != 255:
+        return None
+    if scapy.ICMPv6ND_NA in pkt:
+        # an advertisement is about its target, at the target link-layer address
+        ip = pkt[scapy.ICMPv6ND_NA].tgt
+        opt = scapy.ICMPv6NDOptDstLLAddr
+    elif any(t in pkt for t in NDP_TYPES):
+        ip = pkt[scapy.IPv6].src
+        opt = scapy.ICMPv6NDOptSrcLLAddr
+    else:
+        return None
+    if ip == "::":  # duplicate address detection probes have no source yet
+        return None
+    mac = pkt[opt].lladdr if opt in pkt else pkt[scapy.Ether].src
+    return mac, ip
+
+
+def _ndp_listener(report, stop_event):
+    """Passively pick up IPv6 neighbors from NDP traffic already on the link."""
+    def handle(pkt):
+        found = _ndp_neighbor(pkt)
+        if found:
+            report(*found)
+
+    while stop_event is None or not stop_event.is_set():
+        scapy.sniff(filter=NDP_FILTER, prn=handle, store=False, timeout=NDP_SNIFF_TIMEOUT)
+
+
+def run_scan(callback=None, stop_event=None, interval=30, ipv6=True):
+    """Continuously scan until stop_event is set.
+
+    IPv6 neighbors are reported through the same callback as IPv4 ones, so a
+    dual-stack device shows up once per address under the same MAC.
+    """
+    lock = threading.Lock()
+    reported = {}  # (mac int, ip) -> time last passed to callback
+    devices = DeviceTable()  # everything answered so far, so vendors are looked up once
+
+    def lookup(mac, ip):
+        with lock:
+            dev = devices.get(mac_to_int(mac))
+            vendor = dev.vendor if dev is not None else _vendor(mac)
+            return devices.update(mac, vendor, ip)[0]
+
+    def report(mac, ip):
+        now = time.time()
+        dev = lookup(mac, ip)
+        with lock:
+            if now - reported.get((dev.mac, ip), 0) < interval:
+                return
+            reported[(dev.mac, ip)] = now
+        mac, vendor = dev.mac_str, dev.vendor
+        if callback:
+            callback(mac, vendor, ip)
+        else:
+            print(mac, vendor, ip)
+
+    ipv6_failed = set()  # IPv6 parts that have already reported an error
+
+    def ipv6_guard(target, *args):
+        # IPv6 is best-effort: on hosts without it (or without libpcap) the scan
+        # carries on with IPv4, but the first failure of each part is reported
+        try:
+            target(*args)
+        except Exception as e:
+            with lock:
+                first = target.__name__ not in ipv6_failed
+                ipv6_failed.add(target.__name__)
+            if not first:
+                return
+            msg = f"IPv6 discovery stopped ({target.__name__.strip('_')}): {e}"
+            if callback:
+                callback("error", "ipv6_failed", msg)
+            else:
+                print(msg)
+
+    def forget_history():
+        # The scanner's own table is only a lookup cache (the GUIs keep the
+        # inventory): drop devices and IPv6 addresses quiet for a couple of
+        # cycles; one that answers again just has its vendor looked up again.
+        # `reported` is left alone (it is pruned every cycle) so nothing is re-sent.
+        before = time.time() - 2 * interval
+        with lock:
+            devices.expire(before)
+            devices.expire_ipv6(before)
+
+    def wait(seconds):
+        """Sleep until the next cycle; True if we were asked to stop meanwhile."""
+        if stop_event is None:
+            time.sleep(seconds)
+            return False
+        return stop_event.wait(seconds)
+
+    if ipv6:
+        threading.Thread(target=ipv6_guard, args=(_ndp_listener, report, stop_event),
+                         name="ndp-listener", daemon=True).start()
+
+    # checked on this thread only, after each sweep; created here, once scapy is
+    # loaded, so its ceiling starts from what the scanner really needs
+    budget = pi_mode.MemoryBudget()
+    budget.register("vendor cache", _drop_vendor_cache)
+    budget.register("device history", forget_history)
     try:
         count = 0
+        ns_cursor = 0  # where the next round of neighbor solicitations starts in the MAC list
         while True:
             if stop_event is not None and stop_event.is_set():
                 break
 
-            hostname = socket.gethostname()
-            host_ip_address = host_ip.get_local_ip_address()
-            network = str(IPv4Interface(host_ip_address + '/24').network)
+            sweep6 = None
+            if ipv6:
+                prefixes = _ipv6_prefixes()  # once per sweep, not once per MAC
+                with lock:
+                    known_macs, ns_cursor = _ns_round(devices.macs.tolist(), ns_cursor, prefixes)
+                sweep6 = threading.Thread(target=ipv6_guard,
+                                          args=(_ipv6_sweep, known_macs, prefixes, report, stop_event),
+                                          name="ipv6-sweep", daemon=True)
+                sweep6.start()
 
             try:
+                host_ip_address = host_ip.get_local_ip_address()
+                network = str(IPv4Interface(host_ip_address + '/24').network)
                 ans, _ = scapy.arping(network, timeout=2, retry=1, verbose=False)
             except Exception as e:
                 if callback:
                     callback("error", "scan_failed", str(e))
-                time.sleep(5)
+                if sweep6 is not None:
+                    sweep6.join()
+                if wait(5):
+                    break
                 continue
 
             seen = set()
@@ -41,22 +268,26 @@ def run_scan(callback=None, stop_event=None, interval=30):
                 if (mac, ip) in seen:
                     continue
                 seen.add((mac, ip))
-                vendor = _vendor(mac)
+                vendor = lookup(mac, ip).vendor
                 if callback:
                     callback(mac, vendor, ip)
                 else:
                     print(mac, vendor, ip)
 
+            if sweep6 is not None:
+                sweep6.join()
+            with lock:
+                # forget addresses nobody has answered from in a while (privacy addresses rotate)
+                cutoff = time.time() - 2 * interval
+                for key in [k for k, ts in reported.items() if ts < cutoff]:
+                    del reported[key]
             count += 1
 
-            # Sleep in short chunks so we can stop promptly
-            slept = 0
-            while slept < interval:
-                if stop_event is not None and stop_event.is_set():
-                    break
-                time.sleep(0.2)
-                slept += 0.2
-            if stop_event is not None and stop_event.is_set():
+            if pi_mode.ENABLED:
+                budget.check()
+
+            # Block until the next cycle; stop_event wakes us immediately
+            if wait(interval):
                 break
 
     except KeyboardInterrupt:
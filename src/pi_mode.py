@@ -0,0 +1,201 @@
+import gc
+import logging
+import os
+import sys
+import time
+
+# Low-footprint profile for Raspberry Pi class devices.
+# Turn it on with HOMENETSAFE_PI_MODE=1. Modules read ENABLED to pick lighter
+# defaults (no full manuf table, slower status refresh) and keep their own
+# MemoryBudget, which runs their evictors cheapest-first whenever RSS goes over
+# the ceiling. Evictors only drop caches and other state that can be rebuilt,
+# never the device inventory. A budget is only checked on the thread that owns
+# the data its evictors drop.
+#
+# The ceiling is the RSS a budget measures when it is created (i.e. after the
+# owner's imports) plus HOMENETSAFE_RSS_HEADROOM_MB. HOMENETSAFE_RSS_MB sets an
+# absolute ceiling instead, but never one below that starting point.
+
+ENABLED = os.environ.get("HOMENETSAFE_PI_MODE", "").lower() not in ("", "0", "false", "no")
+RSS_LIMIT_MB = int(os.environ["HOMENETSAFE_RSS_MB"]) if os.environ.get("HOMENETSAFE_RSS_MB") else None
+RSS_HEADROOM_MB = int(os.environ.get("HOMENETSAFE_RSS_HEADROOM_MB", "32"))
+# once evicting everything can't get under the ceiling, wait for RSS to grow
+# this much more before trying (and paying for gc + malloc_trim) again
+RSS_RETRY_STEP_MB = 8
+# HOMENETSAFE_TIMING=1 makes the GUIs print startup timings (see process_age)
+TIMING = os.environ.get("HOMENETSAFE_TIMING", "").lower() not in ("", "0", "false", "no")
+
+_imported = time.monotonic()
+log = logging.getLogger(__name__)
+MB = 1024 * 1024
+
+
+def rss_bytes():
+    """Current resident set size; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def process_age():
+    """Seconds since this process was started (since this module was imported where /proc is missing)."""
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0]) - started
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _imported
+
+
+def _trim_heap():
+    # hand freed arenas back to the OS so RSS actually drops (glibc only)
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except Exception:
+        pass
+
+
+class MemoryBudget:
+    """Runs registered evictors, in registration order, until RSS is back under the limit.
+
+    Create it once the owner's imports are done: the ceiling starts from the
+    RSS measured here. Not thread-safe: register evictors and call check()
+    from the one thread that owns what they free.
+    """
+
+    def __init__(self, limit_mb=RSS_LIMIT_MB, headroom_mb=RSS_HEADROOM_MB):
+        self.baseline = rss_bytes()
+        floor = self.baseline + headroom_mb * MB
+        self.limit = floor if limit_mb is None else limit_mb * MB
+        if self.limit < floor:
+            log.warning("memory ceiling %d MB is below the %d MB in use after startup; using %d MB",
+                        limit_mb, self.baseline // MB, floor // MB)
+            self.limit = floor
+        self._retry_at = 0  # RSS at which to evict again after evicting everything wasn't enough
+        self._evictors = []
+
+    def register(self, name, fn):
+        self._evictors.append((name, fn))
+
+    def over(self):
+        return rss_bytes() > max(self.limit, self._retry_at)
+
+    def check(self):
+        """Evict until under the ceiling; returns the names of what was evicted."""
+        if not self.over():
+            return []
+        evicted = []
+        for name, fn in self._evictors:
+            try:
+                fn()
+            except Exception:
+                log.exception("memory budget: evictor %r failed", name)
+                continue
+            evicted.append(name)
+            gc.collect()
+            _trim_heap()
+            if rss_bytes() <= self.limit:
+                break
+        rss = rss_bytes()
+        if rss > self.limit:
+            # nothing left to drop gets us under; don't repeat this on every check
+            self._retry_at = rss + RSS_RETRY_STEP_MB * MB
+            log.warning("memory budget: still at %d MB after evicting %s (ceiling %d MB)",
+                        rss // MB, ", ".join(evicted) or "nothing", self.limit // MB)
+        else:
+            self._retry_at = 0
+        return evicted
+
+
+def _cgroup_limits():
+    """(memory.max, cpu.max) of our cgroup v2, or None where not limited/available."""
+    try:
+        with open("/proc/self/cgroup") as f:
+            path = f.read().strip().split("::")[-1]
+    except OSError:
+        return None, None
+    out = []
+    for name in ("memory.max", "cpu.max"):
+        try:
+            with open(f"/sys/fs/cgroup{path}/{name}") as f:
+                out.append(f.read().strip())
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+
+def _proc_usage(pid):
+    """(CPU seconds, voluntary context switches over all threads, RSS bytes) of a process."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+    switches = rss = 0
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{tid}/status") as f:
+                for line in f:
+                    if line.startswith("voluntary_ctxt_switches:"):
+                        switches += int(line.split()[1])
+                    elif line.startswith("VmRSS:") and not rss:
+                        rss = int(line.split()[1]) * 1024
+        except OSError:
+            pass  # thread exited while we looked
+    return cpu, switches, rss
+
+
+if __name__ == "__main__":
+    # Idle cost of the real scanner between sweeps: CPU, wakeups (voluntary
+    # context switches, i.e. a thread blocking and being woken) and RSS.
+    #   python pi_mode.py [seconds]            starts run_scan and measures it after its first sweep
+    #   python pi_mode.py --pid PID [seconds]  measures a running process, e.g. window.py mid-scan
+    # Compare HOMENETSAFE_PI_MODE=0 and =1, ideally inside a constrained cgroup:
+    #   systemd-run --user --scope -p MemoryMax=64M -p CPUQuota=25% python pi_mode.py 30
+    # The scanner needs scapy and raw-socket rights (root).
+    import subprocess
+
+    args = sys.argv[1:]
+    child = None
+    if args[:1] == ["--pid"]:
+        pid, args = int(args[1]), args[2:]
+    else:
+        # a long interval so the window below only ever sees the scanner idling
+        code = "import network_scan; network_scan.run_scan(callback=lambda *a: None, interval=3600)"
+        child = subprocess.Popen([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        pid = child.pid
+    seconds = float(args[0]) if args else 10
+
+    mem_max, cpu_max = _cgroup_limits()
+    print(f"cgroup memory.max={mem_max}  cpu.max={cpu_max}  pi mode={'on' if ENABLED else 'off'}")
+    try:
+        if child is not None:
+            # first ARP + IPv6 sweep: arping (~4s) plus paced solicitations (up to ~7s)
+            time.sleep(15)
+            if child.poll() is not None:
+                err = child.stderr.read().decode(errors="replace").strip().splitlines()
+                print(f"scanner exited ({child.returncode}): {err[-1] if err else 'no output'}")
+                sys.exit(1)
+        cpu0, sw0, _ = _proc_usage(pid)
+        wall0 = time.monotonic()
+        time.sleep(seconds)
+        cpu1, sw1, rss = _proc_usage(pid)
+        wall = time.monotonic() - wall0
+    except FileNotFoundError:
+        print(f"no process {pid} (or no /proc here)")
+        sys.exit(1)
+    finally:
+        if child is not None:
+            child.terminate()
+
+    print(f"pid {pid} over {wall:.0f}s: idle CPU {(cpu1 - cpu0) / wall * 100:6.3f}%  "
+          f"{(sw1 - sw0) / wall:6.1f} wakeups/s  RSS {rss / 2**20:.1f} MiB")
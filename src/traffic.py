@@ -0,0 +1,317 @@
+import heapq
+import ipaddress
+import mmap
+import select
+import struct
+import sys
+import time
+from array import array
+
+from device_table import ip_to_str, mac_to_str
+
+# Per-device bandwidth accounting.
+# Frames are read straight out of a pcap file (or a raw capture socket) and
+# only the Ethernet/IPv4 address fields are sliced out - no per-packet scapy
+# objects.  Bytes are summed per (dst, src) pair for each second and flushed
+# into fixed-size ring buffers, so memory per device never grows.
+# This is a standalone stage for now (library + CLI below); the scanner and
+# the GUIs don't start a capture or show these numbers yet.
+
+# (seconds per slot, number of slots): 1s for a minute, 1m for an hour, 1h for a day
+RESOLUTIONS = ((1, 60), (60, 60), (3600, 24))
+FIELDS = 4  # tx_bytes, rx_bytes, tx_packets, rx_packets
+TX_BYTES, RX_BYTES, TX_PACKETS, RX_PACKETS = range(FIELDS)
+
+ETH_IPV4 = b"\x08\x00"
+BROADCAST = 0xFFFFFFFFFFFF
+
+# magic -> byte order (usec and nsec timestamp variants; only whole seconds are used)
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": "<",
+    b"\xa1\xb2\xc3\xd4": ">",
+    b"\x4d\x3c\xb2\xa1": "<",
+    b"\xa1\xb2\x3c\x4d": ">",
+}
+LINKTYPE_ETHERNET = 1
+CAPTURE_POLL = 0.5  # seconds capture_live waits for a frame before checking stop_event
+
+# Where a device's IPv4 address may come from when no subnet is given. Frames
+# the router forwards carry internet hosts' addresses under the router's MAC.
+PRIVATE_NETS = ("10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "169.254.0.0/16")
+
+
+class Ring:
+    """Fixed number of time slots; a slot is reset when its time period comes round again."""
+    __slots__ = ("step", "size", "epochs", "data")
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.epochs = array("q", [-1]) * size
+        self.data = array("Q", bytes(8 * FIELDS * size))
+
+    def add(self, ts, counts):
+        epoch = ts // self.step
+        slot = epoch % self.size
+        base = slot * FIELDS
+        data = self.data
+        if epoch < self.epochs[slot]:
+            return  # older than the ring's span; the slot already holds newer data
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            for f in range(FIELDS):
+                data[base + f] = counts[f]
+        else:
+            for f in range(FIELDS):
+                data[base + f] += counts[f]
+
+    def window(self, now, span):
+        """Sum of every field over the last `span` seconds ending at `now`."""
+        newest = now // self.step
+        oldest = newest - max(1, -(-span // self.step)) + 1  # partial slots count whole
+        totals = [0] * FIELDS
+        data = self.data
+        for slot, epoch in enumerate(self.epochs):
+            if oldest <= epoch <= newest:
+                base = slot * FIELDS
+                for f in range(FIELDS):
+                    totals[f] += data[base + f]
+        return totals
+
+    def series(self, now, field=TX_BYTES):
+        """Oldest-to-newest values for one field, zero where nothing was seen."""
+        newest = now // self.step
+        out = [0] * self.size
+        for slot, epoch in enumerate(self.epochs):
+            age = newest - epoch
+            if 0 <= age < self.size:
+                out[self.size - 1 - age] = self.data[slot * FIELDS + field]
+        return out
+
+
+class DeviceTraffic:
+    __slots__ = ("mac", "ip", "totals", "rings", "last_seen")
+
+    def __init__(self, mac):
+        self.mac = mac
+        self.ip = 0
+        self.totals = [0] * FIELDS
+        self.rings = tuple(Ring(step, size) for step, size in RESOLUTIONS)
+        self.last_seen = 0
+
+    def add(self, ts, counts):
+        for f in range(FIELDS):
+            self.totals[f] += counts[f]
+        for ring in self.rings:
+            ring.add(ts, counts)
+        self.last_seen = ts
+
+    def ring_for(self, span):
+        # finest resolution that still covers the whole span
+        for ring in self.rings:
+            if span <= ring.step * ring.size:
+                return ring
+        return self.rings[-1]
+
+
+class TrafficTable:
+    """MAC (48-bit int) -> DeviceTraffic, fed one second of aggregates at a time.
+
+    `local_net` (e.g. "192.168.1.0/24") limits which source IPs are taken as a
+    device's own address; without it any private address is accepted.
+    """
+
+    def __init__(self, max_devices=4096, local_net=None):
+        self.devices = {}
+        self.max_devices = max_devices
+        nets = [ipaddress.IPv4Network(n, strict=False) for n in ([local_net] if local_net else PRIVATE_NETS)]
+        self.local_nets = tuple((int(n.network_address), int(n.netmask)) for n in nets)
+        self.packets = 0
+        self.bytes = 0
+        self.last_ts = 0
+
+    def _device(self, mac):
+        dev = self.devices.get(mac)
+        if dev is None:
+            if len(self.devices) >= self.max_devices:
+                # keep memory bounded: drop whoever has been quiet the longest
+                stale = min(self.devices.values(), key=lambda d: d.last_seen)
+                del self.devices[stale.mac]
+            dev = self.devices[mac] = DeviceTraffic(mac)
+        return dev
+
+    def flush(self, ts, pair_bytes, pair_packets):
+        """Fold one second of {(dst_src_bytes, ips): n} aggregates into the per-device rings."""
+        per_mac = {}
+        ips = {}
+        for key, nbytes in pair_bytes.items():
+            hdr, ip_pair = key
+            npkts = pair_packets[key]
+            dst = int.from_bytes(hdr[0:6], "big")
+            src = int.from_bytes(hdr[6:12], "big")
+
+            c = per_mac.get(src)
+            if c is None:
+                c = per_mac[src] = [0] * FIELDS
+            c[TX_BYTES] += nbytes
+            c[TX_PACKETS] += npkts
+
+            if dst != BROADCAST and not hdr[0] & 1:  # skip broadcast/multicast receivers
+                c = per_mac.get(dst)
+                if c is None:
+                    c = per_mac[dst] = [0] * FIELDS
+                c[RX_BYTES] += nbytes
+                c[RX_PACKETS] += npkts
+
+            if ip_pair and src not in ips:
+                ip = int.from_bytes(ip_pair[0:4], "big")
+                if self.is_local(ip):
+                    ips[src] = ip
+
+            self.packets += npkts
+            self.bytes += nbytes
+
+        for mac, counts in per_mac.items():
+            dev = self._device(mac)
+            dev.add(ts, counts)
+            ip = ips.get(mac)
+            if ip:
+                dev.ip = ip
+        self.last_ts = max(self.last_ts, ts)
+
+    def is_local(self, ip):
+        return any(ip & mask == net for net, mask in self.local_nets)
+
+    def top_talkers(self, n=10, span=None, now=None):
+        """The n busiest devices by tx+rx bytes, over all time or the last `span` seconds."""
+        if span is None:
+            return heapq.nlargest(
+                n, self.devices.values(),
+                key=lambda d: d.totals[TX_BYTES] + d.totals[RX_BYTES],
+            )
+        now = self.last_ts if now is None else now
+
+        def windowed(dev):
+            w = dev.ring_for(span).window(now, span)
+            return w[TX_BYTES] + w[RX_BYTES]
+        return heapq.nlargest(n, self.devices.values(), key=windowed)
+
+
+class Aggregator:
+    """Sums raw Ethernet frames per second and hands each finished second to a TrafficTable."""
+
+    def __init__(self, table):
+        self.table = table
+        self.second = None
+        self.pair_bytes = {}
+        self.pair_packets = {}
+
+    def feed(self, ts, frame, length):
+        sec = int(ts)
+        if sec != self.second:
+            self.flush()
+            self.second = sec
+        if length >= 34 and frame[12:14] == ETH_IPV4:
+            key = (frame[0:12], frame[26:34])
+        else:
+            key = (frame[0:12], b"")
+        pb = self.pair_bytes
+        pb[key] = pb.get(key, 0) + length
+        pp = self.pair_packets
+        pp[key] = pp.get(key, 0) + 1
+
+    def flush(self):
+        if self.pair_bytes:
+            self.table.flush(self.second, self.pair_bytes, self.pair_packets)
+            self.pair_bytes = {}
+            self.pair_packets = {}
+
+
+def read_pcap(path, table=None):
+    """Account every frame of a classic libpcap file into `table` (created if not given)."""
+    table = TrafficTable() if table is None else table
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if len(buf) < 24 or buf[0:4] not in _PCAP_MAGIC:
+            raise ValueError(f"{path}: not a libpcap file (pcapng is not supported)")
+        endian = _PCAP_MAGIC[buf[0:4]]
+        linktype = struct.unpack_from(endian + "I", buf, 20)[0] & 0x0FFFFFFF
+        if linktype != LINKTYPE_ETHERNET:
+            raise ValueError(f"{path}: unsupported link type {linktype}")
+
+        _account(buf, struct.Struct(endian + "IIII"), table)
+    return table
+
+
+def _account(buf, rec, table):
+    # Hot loop: everything is a local, and packets are summed per (pair, second)
+    # in plain dicts that are only folded into the table once per second.
+    unpack = rec.unpack_from
+    hdr_len = rec.size
+    end = len(buf)
+    off = 24
+    second = None
+    pair_bytes = {}
+    pair_packets = {}
+    get_b = pair_bytes.get
+    get_p = pair_packets.get
+    while off + hdr_len <= end:
+        ts_sec, _, incl_len, orig_len = unpack(buf, off)
+        off += hdr_len
+        if ts_sec != second:
+            if pair_bytes:
+                table.flush(second, pair_bytes, pair_packets)
+                pair_bytes = {}
+                pair_packets = {}
+                get_b = pair_bytes.get
+                get_p = pair_packets.get
+            second = ts_sec
+        if incl_len >= 14:
+            if incl_len >= 34 and buf[off + 12:off + 14] == ETH_IPV4:
+                key = (buf[off:off + 12], buf[off + 26:off + 34])
+            else:
+                key = (buf[off:off + 12], b"")
+            pair_bytes[key] = get_b(key, 0) + orig_len
+            pair_packets[key] = get_p(key, 0) + 1
+        off += incl_len
+    if pair_bytes:
+        table.flush(second, pair_bytes, pair_packets)
+
+
+def capture_live(table, stop_event, iface=None):
+    """Account frames from a raw capture socket until stop_event is set (needs scapy + root)."""
+    import scapy.all as scapy
+
+    agg = Aggregator(table)
+    sock = scapy.conf.L2listen(iface=iface)
+    try:
+        while not stop_event.is_set():
+            # recv_raw blocks, so only call it once a frame is waiting; a quiet
+            # link still lets us notice stop_event every CAPTURE_POLL seconds
+            if not select.select([sock], [], [], CAPTURE_POLL)[0]:
+                continue
+            # recv_raw skips scapy's dissection; we only need the bytes
+            _, frame, ts = sock.recv_raw()
+            if frame is None or len(frame) < 14:
+                continue
+            agg.feed(ts or time.time(), frame, len(frame))
+    finally:
+        agg.flush()
+        sock.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python traffic.py capture.pcap [top_n] [local_net]")
+        sys.exit(1)
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    local_net = sys.argv[3] if len(sys.argv) > 3 else None
+    start = time.perf_counter()
+    result = read_pcap(sys.argv[1], TrafficTable(local_net=local_net))
+    elapsed = time.perf_counter() - start
+    rate = result.bytes * 8 / elapsed / 1e6 if elapsed else 0
+    print(f"{result.packets} packets, {result.bytes} bytes in {elapsed:.2f}s ({rate:.0f} Mbit/s replay)")
+    for dev in result.top_talkers(top_n):
+        t = dev.totals
+        print(f"{mac_to_str(dev.mac)}  {ip_to_str(dev.ip):<15}  "
+              f"tx {t[TX_BYTES]:>12} B / {t[TX_PACKETS]:>8} pkts  "
+              f"rx {t[RX_BYTES]:>12} B / {t[RX_PACKETS]:>8} pkts")
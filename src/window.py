@@ -8,6 +8,9 @@ import time
 import csv
 import os
 import manuf
+import pi_mode
+from device_model import COLUMNS, DeviceModel
+from device_table import SNAPSHOT_MAX_AGE, SNAPSHOT_PATH, DeviceTable, mac_to_int, mac_to_str
 
 # =========================
 # CONFIG
@@ -25,23 +28,38 @@ WARNING = "#f59e0b"  # amber-500
 ROW_ALT = "#111827"
 
 DEVICE_TTL = 60  # seconds of inactivity before a device is marked inactive
-QUEUE_POLL_MS = 100
-STATUS_REFRESH_MS = 1000
+QUEUE_COALESCE_MS = 100  # scanner results arriving within this window are applied together
+STATUS_REFRESH_MS = 5000 if pi_mode.ENABLED else 1000
+SNAPSHOT_EVERY_MS = 5 * 60 * 1000  # how often the inventory snapshot is rewritten while running
+SNAPSHOT_CHUNK = 500  # snapshot rows put on screen per Tk callback at startup
+# alternating row colors cost a Tk call per row; skip them on huge tables (and on a Pi)
+STRIPE_MAX_ROWS = 0 if pi_mode.ENABLED else 2000
+ALL_VENDORS = "All vendors"
 
 # =========================
 # Best-effort import and live-reload of user scanner
 # If unavailable, fall back to a local mock generator so the UI still shines.
+# The import happens on the scan thread when the first scan starts: scapy
+# takes a second or more to load, and the first screen shouldn't wait for it.
 # =========================
 run_scan = None
 
-try:
-    import network_scan  # expected to expose run_scan(callback(mac,vendor,ip), stop_event)
-    importlib.reload(network_scan)
-    if hasattr(network_scan, "run_scan") and inspect.isfunction(network_scan.run_scan):
-        run_scan = network_scan.run_scan
-except Exception as e:
-    # We'll gracefully fall back to a mock below
-    run_scan = None
+
+def load_scanner():
+    global run_scan
+    if run_scan is not None:
+        return run_scan
+    try:
+        import network_scan  # expected to expose run_scan(callback(mac,vendor,ip), stop_event)
+        importlib.reload(network_scan)
+        if hasattr(network_scan, "run_scan") and inspect.isfunction(network_scan.run_scan):
+            run_scan = network_scan.run_scan
+    except Exception as e:
+        # We'll gracefully fall back to a mock below
+        run_scan = None
+    if run_scan is None:
+        run_scan = _mock_run_scan
+    return run_scan
 
 
 def _mock_run_scan(on_new_device, stop_event):
@@ -62,22 +80,24 @@ def _mock_run_scan(on_new_device, stop_event):
         i += 1
         time.sleep(0.6)
 
-
-if run_scan is None:
-    run_scan = _mock_run_scan
-
 # =========================
 # App State
 # =========================
 q = queue.Queue()
+drain_scheduled = threading.Event()  # set while a poll_queue call is pending on the Tk loop
 scan_thread = None
 stop_event = threading.Event()
 scan_start_time = None
 
-# MAC -> Tk item id
-known_devices = {}
-# MAC -> last_seen epoch
-last_seen = {}
+# Every device seen, merged by MAC (addresses, vendor, last seen). Tk item ids
+# are the MAC text; rows hidden by a filter are detached, not deleted.
+devices = DeviceTable()
+# True while snapshot rows are still being put on screen
+snapshot_loading = False
+first_row_drawn = False
+snapshot_dirty = False
+# Last ("error", "scan_failed", msg) reported by the scanner
+last_error = None
 
 # =========================
 # UI Helpers
@@ -143,6 +163,10 @@ def on_new_device(mac, vendor, ip):
     vendor = vendor or "Unknown"
     ip = ip or "—"
     q.put((mac, vendor, ip, time.time()))
+    # Wake the UI once per burst of results instead of polling the queue on a timer
+    if not drain_scheduled.is_set():
+        drain_scheduled.set()
+        root.after(QUEUE_COALESCE_MS, poll_queue)
 
 
 def device_type_from_vendor(vendor: str) -> str:
@@ -164,26 +188,11 @@ def device_type_from_vendor(vendor: str) -> str:
 sort_state = {}
 
 def sort_by_column(tree, col):
-    data = [(tree.set(k, col), k) for k in tree.get_children("")]
-
-    # Detect type
-    def as_key(val):
-        # IP-aware sort
-        if col == "IP Address" and val and val != "—":
-            parts = val.split(".")
-            if len(parts) == 4 and all(p.isdigit() for p in parts):
-                return tuple(int(p) for p in parts)
-        # status priority
-        if col == "Status":
-            order = {"Active": 0, "Inactive": 1}
-            return order.get(val, 2)
-        return val.lower() if isinstance(val, str) else val
-
+    # The model keeps every column pre-sorted; we just hand Tk the new order in one call
     reverse = sort_state.get(col, False)
-    data.sort(key=lambda x: as_key(x[0]), reverse=reverse)
-    for index, (_, k) in enumerate(data):
-        tree.move(k, "", index)
+    tree.set_children("", *iids(model.sort(col, reverse)))
     sort_state[col] = not reverse
+    restripe()
 
 
 # =========================
@@ -191,7 +200,7 @@ def sort_by_column(tree, col):
 # =========================
 root = tk.Tk()
 root.title(APP_TITLE)
-root.geometry("980x660")
+root.geometry("1200x660")
 root.minsize(780, 520)
 
 apply_styles(root)
@@ -225,13 +234,29 @@ start_btn.grid(row=0, column=0, padx=(0, 8))
 stop_btn.grid(row=0, column=1, padx=8)
 export_btn.grid(row=0, column=2, padx=8)
 
+# Search / vendor filters
+filter_frame = ttk.Frame(controls_card, style="Card.TFrame")
+filter_frame.pack(side="right")
+
+search_var = tk.StringVar()
+vendor_var = tk.StringVar(value=ALL_VENDORS)
+
+ttk.Label(filter_frame, text="Search", style="Info.TLabel").grid(row=0, column=0, padx=(0, 6))
+search_entry = ttk.Entry(filter_frame, textvariable=search_var, width=24)
+vendor_box = ttk.Combobox(filter_frame, textvariable=vendor_var, state="readonly", width=22, values=(ALL_VENDORS,))
+
+search_entry.grid(row=0, column=1, padx=(0, 8))
+vendor_box.grid(row=0, column=2)
+
 
 # --- Tree Card ---
 list_card = ttk.Frame(root, style="Card.TFrame", padding=12)
 list_card.pack(fill="both", expand=True, padx=16, pady=(8, 16))
 
-columns = ("Type", "MAC Address", "Vendor", "IP Address", "Status")
+columns = COLUMNS
 tree = ttk.Treeview(list_card, columns=columns, show="headings")
+# Rows last seen before launch came from the snapshot and show as "Stale"
+model = DeviceModel(devices, type_of=device_type_from_vendor)
 
 # Configure columns
 col_specs = {
@@ -239,6 +264,7 @@ col_specs = {
     "MAC Address": dict(width=170, anchor="center"),
     "Vendor": dict(width=260, anchor="center"),
     "IP Address": dict(width=150, anchor="center"),
+    "IPv6 Address": dict(width=260, anchor="center"),
     "Status": dict(width=100, anchor="center"),
 }
 
@@ -256,6 +282,7 @@ scrollbar.pack(side="right", fill="y")
 
 # Row tags for styling
 tree.tag_configure("inactive", foreground=TEXT_MUTED)
+tree.tag_configure("stale", foreground=TEXT_MUTED, font=("Segoe UI", 10, "italic"))
 tree.tag_configure("alt", background=ROW_ALT)
 
 # --- Status Bar ---
@@ -274,6 +301,7 @@ count_lbl.pack(side="right")
 menu = tk.Menu(root, tearoff=0)
 menu.add_command(label="Copy MAC", command=lambda: copy_col(1))
 menu.add_command(label="Copy IP", command=lambda: copy_col(3))
+menu.add_command(label="Copy IPv6", command=lambda: copy_col(4))
 menu.add_separator()
 menu.add_command(label="Ping (opens terminal)", command=lambda: ping_selected())
 
@@ -323,73 +351,151 @@ def ping_selected():
 
 
 
-def insert_or_update_device(mac, vendor, ip, now_ts):
-    device_type = device_type_from_vendor(vendor)
-    status_text = "Active"
-
-    if mac in known_devices:
-        iid = known_devices[mac]
-        cur = tree.item(iid, "values")
-        new_vals = (device_type, mac, vendor, ip, status_text)
-        if cur != new_vals:
-            tree.item(iid, values=new_vals, tags=("",))
-    else:
-        iid = tree.insert("", "end", values=(device_type, mac, vendor, ip, status_text))
-        known_devices[mac] = iid
+def iids(macs):
+    return [mac_to_str(mac) for mac in macs]
 
-    last_seen[mac] = now_ts
 
+def show_row(mac, old, new):
+    """Refresh a row's Tk item and move it to its (sorted, filtered) display position."""
+    iid = mac_to_str(mac)
+    values = model.values(mac)
+    tags = row_tags(values[-1])
+    if not tree.exists(iid):
+        tree.insert("", "end" if new is None or snapshot_loading else new, iid=iid, values=values, tags=tags)
+        if new is None:
+            tree.detach(iid)
+        return
+    tree.item(iid, values=values, tags=tags)
+    if not snapshot_loading:  # the order is handed to Tk in one go once loading finishes
+        move_row(iid, old, new)
+
+
+def move_row(iid, old, new):
+    if new is None:
+        if old is not None:
+            tree.detach(iid)
+    elif new != old:
+        tree.move(iid, "", new)
+
+
+def row_tags(status_text):
+    return {"Inactive": ("inactive",), "Stale": ("stale",)}.get(status_text, ())
+
+
+def restripe():
     # Alternating row backgrounds for readability
-    for i, child in enumerate(tree.get_children("")):
-        tags = list(tree.item(child, "tags"))
+    visible = tree.get_children("")
+    if len(visible) > STRIPE_MAX_ROWS:
+        return
+    for i, iid in enumerate(visible):
+        tags = row_tags(model.status(mac_to_int(iid)))
         if i % 2 == 1:
-            if "alt" not in tags:
-                tags.append("alt")
-        else:
-            if "alt" in tags:
-                tags.remove("alt")
-        tree.item(child, tags=tuple(tags))
+            tags += ("alt",)
+        tree.item(iid, tags=tags)
+
+
+def apply_filters(*_):
+    vendor = vendor_var.get()
+    visible = model.set_filter(search_var.get(), None if vendor == ALL_VENDORS else vendor)
+    if not snapshot_loading:
+        tree.set_children("", *iids(visible))
+        restripe()
+
+
+def insert_or_update_device(mac, vendor, ip, now_ts):
+    global last_error, snapshot_dirty
+    if mac == "error":
+        last_error = ip
+        return False
+
+    # One row per MAC: IPv6 addresses accumulate, IPv4 replaces the previous one
+    dev, redraw, old, new = model.update(mac, vendor, ip, now_ts)
+    snapshot_dirty = True
+    if redraw:
+        show_row(dev.mac, old, new)
+    return redraw
 
 
 
 def poll_queue():
     # Pull everything quickly so UI stays snappy
+    drain_scheduled.clear()
+    changed = False
     try:
         while True:
             mac, vendor, ip, ts = q.get_nowait()
-            insert_or_update_device(mac, vendor, ip, ts)
+            changed = insert_or_update_device(mac, vendor, ip, ts) or changed
     except queue.Empty:
         pass
-    root.after(QUEUE_POLL_MS, poll_queue)
+    if changed:
+        restripe()
+        note_first_row()
+
 
+def note_first_row():
+    # HOMENETSAFE_TIMING=1: how long from launch until there is something to look at
+    global first_row_drawn
+    if first_row_drawn or not pi_mode.TIMING:
+        return
+    first_row_drawn = True
+    root.update_idletasks()
+    print(f"first row drawn {pi_mode.process_age():.2f}s after launch")
+
+
+
+def forget_devices(before):
+    """Drop devices, and IPv6 addresses, last seen before `before` from the model and the tree."""
+    global snapshot_dirty
+    removed = model.expire(before)
+    gone = [iid for iid in iids(removed) if tree.exists(iid)]
+    if gone:
+        tree.delete(*gone)
+    changed, moves = model.expire_ipv6(before)
+    for mac in changed:
+        iid = mac_to_str(mac)
+        if tree.exists(iid):
+            values = model.values(mac)
+            tree.item(iid, values=values, tags=row_tags(values[-1]))
+    if moves is None and not snapshot_loading:
+        tree.set_children("", *iids(model.visible()))
+    if removed or changed:
+        snapshot_dirty = True
+        restripe()
 
 
 def refresh_statuses():
-    now = time.time()
-    # mark inactive if stale
-    for mac, iid in list(known_devices.items()):
-        seen = last_seen.get(mac, 0)
-        idle = now - seen
-        vals = list(tree.item(iid, "values"))
-        if idle > DEVICE_TTL:
-            if vals[-1] != "Inactive":
-                vals[-1] = "Inactive"
-                tree.item(iid, values=tuple(vals), tags=("inactive",))
+    # mark inactive if stale; only rows whose state flipped are touched.
+    # Snapshot rows keep "Stale" until a scan sees them again.
+    flipped, moves = model.set_cutoff(time.time() - DEVICE_TTL)
+    for mac in flipped:
+        iid = mac_to_str(mac)
+        if tree.exists(iid):  # snapshot rows may not be on screen yet
+            values = model.values(mac)
+            tree.item(iid, values=values, tags=row_tags(values[-1]))
+    if not snapshot_loading:
+        if moves is None:
+            tree.set_children("", *iids(model.visible()))
         else:
-            if vals[-1] != "Active":
-                vals[-1] = "Active"
-                tree.item(iid, values=tuple(vals), tags=("",))
+            for mac, old, new in moves:
+                move_row(mac_to_str(mac), old, new)
+    if flipped:
+        restripe()
 
     # counters & progress
-    active = sum(1 for mac in known_devices if time.time() - last_seen.get(mac, 0) <= DEVICE_TTL)
-    count_var.set(f"Devices: {len(known_devices)}  •  Active: {active}")
+    active, _, stale = model.counts()
+    counts = f"Devices: {len(devices)}  •  Active: {active}"
+    if stale:
+        counts += f"  •  Stale: {stale}"
+    if model.text or model.vendor:
+        counts += f"  •  Showing: {len(tree.get_children(''))}"
+    count_var.set(counts)
 
     if scan_thread and scan_thread.is_alive():
         elapsed = int(time.time() - scan_start_time) if scan_start_time else 0
-        status_var.set(f"Scanning… {elapsed}s")
+        status_var.set(f"Scanning… {elapsed}s" + (f"  •  Error: {last_error}" if last_error else ""))
     else:
-
-        status_var.set("Scan stopped" if scan_start_time else "Ready to scan network")
+        status_var.set(("Scan stopped" if scan_start_time else "Ready to scan network")
+                       + (f"  •  Error: {last_error}" if last_error else ""))
 
     root.after(STATUS_REFRESH_MS, refresh_statuses)
 
@@ -397,7 +503,7 @@ def refresh_statuses():
 
 
 def export_csv():
-    if not known_devices:
+    if not len(devices):
         messagebox.showinfo("Export", "No devices to export yet.")
         return
     path = filedialog.asksaveasfilename(
@@ -409,10 +515,9 @@ def export_csv():
         return
     with open(path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        w.writerow(["Type", "MAC", "Vendor", "IP", "Status", "Last Seen (epoch)"])
-        for mac, iid in known_devices.items():
-            vals = tree.item(iid, "values")
-            w.writerow([*vals, int(last_seen.get(mac, 0))])
+        w.writerow(["Type", "MAC", "Vendor", "IP", "IPv6", "Status", "Last Seen (epoch)"])
+        for dev in devices:
+            w.writerow([*model.values(dev.mac), int(dev.last_seen)])
     status_var.set(f"Exported to {os.path.basename(path)}")
 
 
@@ -421,25 +526,25 @@ def export_csv():
 # =========================
 
 def start_scan():
-    global scan_thread, stop_event, scan_start_time
+    global scan_thread, stop_event, scan_start_time, last_error
 
     if scan_thread and scan_thread.is_alive():
         return
 
-    # Fresh state but keep rows to visualize live updates; if you want a full reset, uncomment below
-    for child in tree.get_children(""):
-        tree.delete(child)
-    known_devices.clear()
-    last_seen.clear()
+    # Keep the current inventory: the scan reconciles against it, updating rows in
+    # place and turning "Stale" snapshot rows back to "Active" as devices answer
+    last_error = None
 
-    stop_event = threading.Event()
+    stop_event = event = threading.Event()
     scan_start_time = time.time()
 
     def runner():
         try:
-            run_scan(on_new_device, stop_event)
+            load_scanner()(on_new_device, event)
         except Exception as e:
-            q.put(("00:00:00:00:00:00", f"Scanner error: {e}", "—", time.time()))
+            on_new_device("error", "scan_failed", f"Scanner error: {e}")
+        finally:
+            root.after(0, on_scan_finished, event)
 
     scan_thread = threading.Thread(target=runner, name="network-scan", daemon=True)
     scan_thread.start()
@@ -448,6 +553,15 @@ def start_scan():
     stop_btn.configure(state="normal")
 
 
+def on_scan_finished(event):
+    # the runner exited (stopped, or the scanner died); let the user start again
+    if event is not stop_event:  # an older scan; a new one is already running
+        return
+    event.set()
+    start_btn.configure(state="normal")
+    stop_btn.configure(state="disabled")
+
+
 def stop_scan():
     global scan_thread
     try:
@@ -464,12 +578,65 @@ def stop_scan():
 start_btn.configure(command=start_scan)
 stop_btn.configure(command=stop_scan)
 export_btn.configure(command=export_csv)
+search_var.trace_add("write", apply_filters)
+vendor_box.bind("<<ComboboxSelected>>", apply_filters)
+vendor_box.configure(postcommand=lambda: vendor_box.configure(values=(ALL_VENDORS, *model.vendors())))
 
 tree.bind("<Button-3>", popup_menu)  # right-click
 
+# =========================
+# Inventory snapshot (warm start)
+# =========================
+
+def load_snapshot():
+    # Show the last known inventory right away; rows stay "Stale" until a scan sees them again
+    global snapshot_loading
+    if len(devices) or not devices.load(SNAPSHOT_PATH) or not len(devices):
+        return
+    model.rebuild()
+    snapshot_loading = True
+    pending = devices.macs.tolist()
+
+    def insert_chunk():
+        global snapshot_loading
+        for mac in pending[:SNAPSHOT_CHUNK]:
+            iid = mac_to_str(mac)
+            if mac in devices and not tree.exists(iid):
+                values = model.values(mac)
+                tree.insert("", "end", iid=iid, values=values, tags=row_tags(values[-1]))
+        note_first_row()
+        del pending[:SNAPSHOT_CHUNK]
+        if pending:
+            root.after(1, insert_chunk)
+            return
+        snapshot_loading = False
+        tree.set_children("", *iids(model.visible()))
+        restripe()
+    insert_chunk()
+
+
+def save_snapshot():
+    global snapshot_dirty
+    if not snapshot_dirty:
+        return
+    try:
+        devices.save(SNAPSHOT_PATH)
+        snapshot_dirty = False
+    except OSError as e:
+        status_var.set(f"Couldn't save inventory: {e}")
+
+
+def periodic_snapshot():
+    # snapshot devices that never answer again age out instead of staying "Stale" forever
+    forget_devices(time.time() - SNAPSHOT_MAX_AGE)
+    save_snapshot()
+    root.after(SNAPSHOT_EVERY_MS, periodic_snapshot)
+
+
 # Start background loops
-root.after(QUEUE_POLL_MS, poll_queue)
+root.after(0, load_snapshot)
 root.after(STATUS_REFRESH_MS, refresh_statuses)
+root.after(SNAPSHOT_EVERY_MS, periodic_snapshot)
 
 # Safety: stop scan when closing
 
@@ -479,6 +646,7 @@ def on_close():
             stop_event.set()
     except Exception:
         pass
+    save_snapshot()
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)
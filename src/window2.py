@@ -1,16 +1,26 @@
 import customtkinter as ctk
 import threading
-import network_scan as ns
 import csv
+import pi_mode
+from device_table import SNAPSHOT_PATH, DeviceTable
 from tkinter import filedialog, messagebox
 
 #=========Globals for thrread============
 stop_event = None
 scan_thread = None
-table_rows = []  # holds (mac, vendor, ip)
+devices = DeviceTable()  # every device known, merged by MAC (starts from the saved snapshot)
+row_labels = {}  # mac (int) -> (mac, vendor, ip) labels of that device's row
+unconfirmed = set()  # macs from the snapshot that no scan has seen yet ("stale" rows)
+DEVICE_TTL = 60  # seconds without a reply before a device stops counting as active
+STALE_COLOR = "#6b7280"
+# snapshot rows (3 labels each) created per Tk callback at startup: a small first
+# chunk so the window paints quickly, then doubling up to the larger size
+SNAPSHOT_FIRST_CHUNK = 20
+SNAPSHOT_CHUNK = 200
+first_row_drawn = False
 
 def export_csv():
-    if not table_rows:
+    if not len(devices):
         messagebox.showinfo("Export CSV", "No data to export.")
         return
     path = filedialog.asksaveasfilename(
@@ -25,7 +35,7 @@ def export_csv():
         with open(path, "w", newline="", encoding="utf-8") as f:
             w = csv.writer(f)
             w.writerow(["Mac", "Vendor", "IP"])
-            w.writerows(table_rows)
+            w.writerows((d.mac_str, d.vendor, ", ".join(d.addresses())) for d in devices)
         messagebox.showinfo("Export CSV", f"Saved to:\n{path}")
     except Exception as e:
         messagebox.showerror("Export CSV", f"Failed to save:\n{e}")
@@ -128,32 +138,55 @@ for i, w in enumerate(col_weights):
 
 # helpers to manage rows
 _row_iid = 0
-def clear_rows():
-    for child in table_body.winfo_children():
-        child.destroy()
-    global _row_iid
-    _row_iid = 0
-    table_rows.clear()  # clear CSV data
 
 
-def insert_row(values):
+def _addresses_text(dev):
+    # IPv4 first, then any IPv6 addresses, one per line
+    return "\n".join(dev.addresses()) or "—"
+
+
+def insert_row(dev, stale=False):
  
     global _row_iid
     pads = dict(padx=(0, 4), pady=(2, 2), sticky="ew")
+    # stale rows (from the last session's snapshot) are greyed out until seen again
+    color = dict(text_color=STALE_COLOR) if stale else {}
     # one label per column, centered; you can change anchor="w" to left-align
-    ctk.CTkLabel(table_body, text=values[0], anchor="center").grid(row=_row_iid, column=0, **pads)
-    ctk.CTkLabel(table_body, text=values[1], anchor="center").grid(row=_row_iid, column=1, **pads)
-    ctk.CTkLabel(table_body, text=values[2], anchor="center").grid(row=_row_iid, column=2, **pads)
+    labels = (
+        ctk.CTkLabel(table_body, text=dev.mac_str, anchor="center", **color),
+        ctk.CTkLabel(table_body, text=dev.vendor, anchor="center", **color),
+        ctk.CTkLabel(table_body, text=_addresses_text(dev), anchor="center", **color),
+    )
+    for col, label in enumerate(labels):
+        label.grid(row=_row_iid, column=col, **pads)
     _row_iid += 1
-    table_rows.append(tuple(values))  # save row for CSV
+    row_labels[dev.mac] = labels
+
+
+def note_first_row():
+    # HOMENETSAFE_TIMING=1: how long from launch until there is something to look at
+    global first_row_drawn
+    if first_row_drawn or not pi_mode.TIMING:
+        return
+    first_row_drawn = True
+    app.update_idletasks()
+    print(f"first row drawn {pi_mode.process_age():.2f}s after launch")
+
+
+def confirm_row(mac):
+    unconfirmed.discard(mac)
+    normal = ctk.ThemeManager.theme["CTkLabel"]["text_color"]
+    for label in row_labels[mac]:
+        label.configure(text_color=normal)
 
 
 # ================= scan wiring (thread + callback) =================
-seen = set()
-counts = {"devices": 0, "active": 0}
 
 def _update_status():
-    status_label.configure(text=f"Devices: {counts['devices']} • Active: {counts['active']}")
+    text = f"Devices: {len(devices)} • Active: {devices.active(DEVICE_TTL)}"
+    if unconfirmed:
+        text += f" • Stale: {len(unconfirmed)}"
+    status_label.configure(text=text)
 
 
 
@@ -172,26 +205,29 @@ def scan_callback(a, b, c):
         app.after(0, lambda: status_label.configure(text=f"Error: {c}"))
         return
     mac, vendor, ip = a, b, c
-    if mac in seen:
-        return
-    seen.add(mac)
 
-    def ui_insert():
-        counts["devices"] += 1
-        counts["active"] += 1
-        insert_row((mac, vendor, ip))
+    def ui_update():
+        # same device answering on another address (e.g. IPv6 next to IPv4): one row, several IPs
+        dev, changed = devices.update(mac, vendor, ip)
+        labels = row_labels.get(dev.mac)
+        if labels is None:
+            unconfirmed.discard(dev.mac)  # answered before its snapshot row was created
+            insert_row(dev)
+            note_first_row()
+        else:
+            if dev.mac in unconfirmed:
+                confirm_row(dev.mac)
+            if changed:
+                labels[2].configure(text=_addresses_text(dev))
         _update_status()
-    app.after(0, ui_insert)
+    app.after(0, ui_update)
 
 def start_scan():
     _spinner_on()
     global stop_event, scan_thread
     if scan_thread and scan_thread.is_alive():
         return
-    # reset table + counters
-    clear_rows()
-    seen.clear()
-    counts["devices"] = counts["active"] = 0
+    # keep the current rows; the scan reconciles against them instead of starting empty
     _update_status()
 
     btn_start.configure(state="disabled")
@@ -199,12 +235,22 @@ def start_scan():
 
     stop_event = threading.Event()
     scan_thread = threading.Thread(
-        target=ns.run_scan,
+        target=_run_scanner,
         kwargs={"callback": scan_callback, "stop_event": stop_event, "interval": 15},
         daemon=True,
     )
     scan_thread.start()
 
+def _run_scanner(**kwargs):
+    # scapy takes a second or more to import, so the scanner is only loaded
+    # here, on the scan thread, instead of before the window can appear
+    try:
+        import network_scan
+        network_scan.run_scan(**kwargs)
+    except Exception as e:
+        scan_callback("error", "scan_failed", f"Scanner error: {e}")
+
+
 def stop_scan():
     _spinner_off()
     global stop_event
@@ -213,15 +259,40 @@ def stop_scan():
     btn_start.configure(state="normal")
     btn_stop.configure(state="disabled")
 
+def load_snapshot():
+    # last known inventory, shown before the first sweep finishes
+    if len(devices) or not devices.load(SNAPSHOT_PATH) or not len(devices):
+        return
+    pending = devices.macs.tolist()
+    unconfirmed.update(pending)
+    _update_status()
+
+    def insert_chunk(size):
+        # a few hundred rows per callback at most so the window stays responsive while they appear
+        for mac in pending[:size]:
+            dev = devices.get(mac)
+            if dev is not None and mac not in row_labels:
+                insert_row(dev, stale=True)
+        del pending[:size]
+        note_first_row()
+        if pending:
+            app.after(1, insert_chunk, min(size * 2, SNAPSHOT_CHUNK))
+    insert_chunk(SNAPSHOT_FIRST_CHUNK)
+
 def on_close():
     _spinner_off()
     if stop_event:
         stop_event.set()
+    try:
+        devices.save(SNAPSHOT_PATH)
+    except OSError:
+        pass
     app.after(50, app.destroy)
 
 btn_start.configure(command=start_scan)
 btn_stop.configure(command=stop_scan)
 app.protocol("WM_DELETE_WINDOW", on_close)
+app.after(0, load_snapshot)
 # ================= end append block =================
 
 app.mainloop()